@@ -28,6 +28,9 @@ def init_tracking():
 
     def tracked_execute(self, prompt, prompt_id, extra_data={}, execute_outputs=[]):
         """Wrapper that tracks model usage before execution."""
+        if not prompt or not isinstance(prompt, dict):
+            return _original_execute(self, prompt, prompt_id, extra_data, execute_outputs)
+
         try:
             # Extract and record models from the prompt
             tracker.extract_and_record_models(prompt)
@@ -46,6 +46,9 @@ MODEL_LOADERS: dict[str, tuple[str, str | list[str]]] = {
     "QuadrupleCLIPLoaderGGUF": ("gguf", ["clip_name1", "clip_name2", "clip_name3", "clip_name4"]),
 }
 
+# Fast membership test for the standard loaders above
+KNOWN_LOADER_CLASSES: frozenset[str] = frozenset(MODEL_LOADERS)
+
 # Patterns for detecting custom node loaders (Impact Pack, Efficiency Nodes, etc.)
 # These are checked if the node class name isn't in MODEL_LOADERS
 LOADER_PATTERNS: list[tuple[str, str, list[str]]] = [
@@ -59,6 +62,11 @@ LOADER_PATTERNS: list[tuple[str, str, list[str]]] = [
     ("Upscale", "upscaler", ["model_name", "upscale_model"]),
 ]
 
+# LOADER_PATTERNS with lowercased patterns and tuple keys, for case-insensitive matching
+LOADER_PATTERNS_LOWER: tuple[tuple[str, str, tuple[str, ...]], ...] = tuple(
+    (pattern.lower(), category, tuple(keys)) for pattern, category, keys in LOADER_PATTERNS
+)
+
 # Model categories for display purposes
 MODEL_CATEGORIES: dict[str, dict[str, str]] = {
     "checkpoint": {
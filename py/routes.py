@@ -4,11 +4,48 @@ ModelPulse - API Routes
 Custom HTTP routes for the ModelPulse extension.
 """
 
+import hashlib
+import time
+
 from aiohttp import web
 from urllib.parse import unquote
 
+from .storage import dumps
 from .tracking import ModelTracker
 
+# Accepted values for /modelpulse/usage query parameters
+_VALID_TIMEFRAMES = frozenset(("all", "month", "week"))
+_VALID_SORTS = frozenset(("last_used", "usage_count", "name"))
+
+# Maximum number of serialized /modelpulse/usage payloads to keep
+_USAGE_CACHE_SIZE = 16
+
+
+def _ok(payload, status: int = 200, headers: dict[str, str] | None = None) -> web.Response:
+    """
+    Build a JSON response using the storage layer's serializer.
+
+    All routes respond through this helper. `payload` may also be bytes that
+    were already serialized, e.g. from a response cache.
+    """
+    body = payload if isinstance(payload, bytes) else dumps(payload)
+    return web.Response(
+        body=body, status=status, content_type="application/json", headers=headers
+    )
+
+
+def _err(message: str, status: int) -> web.Response:
+    """Build a JSON error response."""
+    return _ok({"error": message}, status=status)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check whether an If-None-Match header matches the given ETag."""
+    if not if_none_match:
+        return False
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return any(tag in (etag, "*") for tag in candidates)
+
 
 def setup_routes(routes, tracker: ModelTracker) -> None:
     """
@@ -18,6 +55,8 @@ def setup_routes(routes, tracker: ModelTracker) -> None:
         routes: PromptServer.instance.routes
         tracker: The ModelTracker instance
     """
+    # Serialized usage payloads keyed by ETag; cleared when it grows too large
+    usage_cache: dict[str, bytes] = {}
 
     @routes.get("/modelpulse/usage")
     async def get_usage_data(request: web.Request) -> web.Response:
@@ -28,23 +67,49 @@ def setup_routes(routes, tracker: ModelTracker) -> None:
             timeframe: "all" (default), "month", or "week"
             sort: "last_used" (default), "usage_count", or "name"
             category: Optional category filter
+            limit: Optional maximum number of models to return
         """
-        timeframe = request.query.get("timeframe", "all")
-        sort_by = request.query.get("sort", "last_used")
-        category = request.query.get("category")
-
-        # Validate parameters
-        if timeframe not in ("all", "month", "week"):
-            timeframe = "all"
-        if sort_by not in ("last_used", "usage_count", "name"):
-            sort_by = "last_used"
-
-        data = tracker.get_usage_data(
-            timeframe=timeframe,
-            sort_by=sort_by,
-            category=category,
-        )
-        return web.json_response(data)
+        query = request.query
+
+        # Validate parameters, falling back to defaults
+        timeframe = query.get("timeframe", "all")
+        timeframe = timeframe if timeframe in _VALID_TIMEFRAMES else "all"
+        sort_by = query.get("sort", "last_used")
+        sort_by = sort_by if sort_by in _VALID_SORTS else "last_used"
+        category = query.get("category")
+        limit = query.get("limit", "")
+        limit = int(limit) if limit.isdecimal() else None
+
+        # The payload only changes with the data, or with the date for rolling timeframes
+        state = "|".join((
+            tracker.data["metadata"]["last_updated"],
+            str(tracker.revision),
+            time.strftime("%Y-%m-%d", time.gmtime()),
+            timeframe,
+            sort_by,
+            category or "",
+            str(limit),
+        ))
+        etag = '"' + hashlib.blake2b(state.encode(), digest_size=8).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if _etag_matches(request.headers.get("If-None-Match"), etag):
+            return web.Response(status=304, headers=headers)
+
+        body = usage_cache.get(etag)
+        if body is None:
+            data = tracker.get_usage_data(
+                timeframe=timeframe,
+                sort_by=sort_by,
+                category=category,
+                limit=limit,
+            )
+            body = dumps(data)
+            if len(usage_cache) >= _USAGE_CACHE_SIZE:
+                usage_cache.clear()
+            usage_cache[etag] = body
+
+        return _ok(body, headers=headers)
 
     @routes.get("/modelpulse/model/{model_id:.*}")
     async def get_model_detail(request: web.Request) -> web.Response:
@@ -58,24 +123,16 @@ def setup_routes(routes, tracker: ModelTracker) -> None:
         data = tracker.get_model_detail(model_id)
 
         if data is None:
-            return web.json_response(
-                {"error": "Model not found"},
-                status=404,
-            )
+            return _err("Model not found", 404)
 
-        return web.json_response(data)
+        return _ok(data)
 
     @routes.get("/modelpulse/categories")
     async def get_categories(request: web.Request) -> web.Response:
         """Get list of model categories with counts."""
         from .model_types import MODEL_CATEGORIES
 
-        usage_data = tracker.get_usage_data()
-        category_counts: dict[str, int] = {}
-
-        for model in usage_data["models"]:
-            cat = model["category"]
-            category_counts[cat] = category_counts.get(cat, 0) + 1
+        category_counts = tracker.get_category_counts()
 
         categories = []
         for cat_id, cat_info in MODEL_CATEGORIES.items():
@@ -89,7 +146,7 @@ def setup_routes(routes, tracker: ModelTracker) -> None:
         # Sort by count descending
         categories.sort(key=lambda x: x["count"], reverse=True)
 
-        return web.json_response({"categories": categories})
+        return _ok({"categories": categories})
 
     @routes.post("/modelpulse/reset")
     async def reset_tracking(request: web.Request) -> web.Response:
@@ -101,19 +158,13 @@ def setup_routes(routes, tracker: ModelTracker) -> None:
         try:
             body = await request.json()
         except Exception:
-            return web.json_response(
-                {"error": "Invalid JSON body"},
-                status=400,
-            )
+            return _err("Invalid JSON body", 400)
 
         if body.get("confirm") is not True:
-            return web.json_response(
-                {"error": "Confirmation required. Send {\"confirm\": true}"},
-                status=400,
-            )
+            return _err("Confirmation required. Send {\"confirm\": true}", 400)
 
         tracker.reset()
-        return web.json_response({"status": "ok", "message": "Tracking data reset"})
+        return _ok({"status": "ok", "message": "Tracking data reset"})
 
     @routes.post("/modelpulse/cleanup")
     async def cleanup_old_data(request: web.Request) -> web.Response:
@@ -131,8 +182,9 @@ def setup_routes(routes, tracker: ModelTracker) -> None:
         if not isinstance(max_days, int) or max_days < 1:
             max_days = 365
 
-        tracker.cleanup(max_days=max_days)
-        return web.json_response({
+        removed = tracker.cleanup(max_days=max_days)
+        return _ok({
             "status": "ok",
             "message": f"Cleaned up entries older than {max_days} days",
+            "removed": removed,
         })
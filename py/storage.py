@@ -5,12 +5,38 @@ JSON-based persistence for model usage data with cross-platform file locking.
 """
 
 import json
+import os
 import sys
+import threading
 import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
+# Use orjson for faster (de)serialization when available
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def dumps(data: Any, indent: bool = False) -> bytes:
+    """Serialize data to UTF-8 encoded JSON bytes."""
+    if HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, option=option)
+    return json.dumps(data, indent=2 if indent else None, ensure_ascii=False).encode("utf-8")
+
+
+def loads(raw: bytes | str) -> Any:
+    """Deserialize JSON bytes or text."""
+    if HAS_ORJSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 # Cross-platform file locking
 if sys.platform == "win32":
     import msvcrt
@@ -77,7 +103,72 @@ class FileLock:
             pass
 
 
-SCHEMA_VERSION = 1
+# Set MODELPULSE_SINGLE_PROCESS=1 when a single ComfyUI instance uses this data
+# directory, to serialize writes in-process instead of through a .lock file
+SINGLE_PROCESS = os.environ.get("MODELPULSE_SINGLE_PROCESS", "").lower() in ("1", "true", "yes")
+
+_process_write_lock = threading.Lock()
+
+# Set MODELPULSE_PRETTY=1 to indent the saved JSON for easier reading
+PRETTY_JSON = os.environ.get("MODELPULSE_PRETTY", "").lower() in ("1", "true", "yes")
+
+
+def _write_lock(path: Path):
+    """Get the lock that serializes writes to `path`."""
+    if SINGLE_PROCESS:
+        return _process_write_lock
+    return FileLock(path)
+
+
+# Windows refuses to replace a file another process has open, and to open one
+# mid-replace, so reads and renames retry for a short while
+IO_RETRY_TIMEOUT = 2.0
+IO_RETRY_DELAY = 0.05
+
+
+def _read_bytes(path: Path) -> bytes:
+    """Read a whole file, retrying briefly on transient OS errors."""
+    deadline = time.time() + IO_RETRY_TIMEOUT
+    while True:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(IO_RETRY_DELAY)
+
+
+def _replace_file(source: Path, target: Path) -> None:
+    """Atomically replace `target` with `source`, retrying briefly while it is open elsewhere."""
+    deadline = time.time() + IO_RETRY_TIMEOUT
+    while True:
+        try:
+            source.replace(target)
+            return
+        except PermissionError:
+            if time.time() > deadline:
+                raise
+            time.sleep(IO_RETRY_DELAY)
+
+
+SCHEMA_VERSION = 2
+
+
+def utc_now() -> tuple[str, str]:
+    """
+    Get the current UTC time as ISO strings from a single clock sample.
+
+    All stored timestamps use this format so they compare correctly as strings.
+
+    Returns:
+        Tuple of (timestamp like "2024-01-31T12:34:56.789012Z", date like "2024-01-31")
+    """
+    now = time.time()
+    parts = time.gmtime(now)
+    today = time.strftime("%Y-%m-%d", parts)
+    micros = int(now % 1 * 1_000_000)
+    return f"{today}T{time.strftime('%H:%M:%S', parts)}.{micros:06d}Z", today
 
 
 def get_storage_path() -> Path:
@@ -95,6 +186,16 @@ def get_storage_path() -> Path:
     return storage_dir / "usage_data.json"
 
 
+def get_journal_path() -> Path:
+    """Get the path to the append-only usage journal."""
+    return get_storage_path().with_suffix(".journal")
+
+
+def get_rotated_journal_path() -> Path:
+    """Get the path the journal is moved to while a snapshot is being written."""
+    return get_storage_path().with_suffix(".journal.old")
+
+
 def get_backup_path() -> Path:
     """Get the path for backup files."""
     storage_path = get_storage_path()
@@ -103,7 +204,7 @@ def get_backup_path() -> Path:
 
 def create_empty_data() -> dict[str, Any]:
     """Create an empty data structure."""
-    now = datetime.utcnow().isoformat() + "Z"
+    now = utc_now()[0]
     return {
         "version": SCHEMA_VERSION,
         "models": {},
@@ -128,10 +229,17 @@ def load_data() -> dict[str, Any]:
         save_data(data)
         return data
 
+    # Readers take no lock: writers replace the file atomically, so a read
+    # always sees either the old or the new snapshot
+    try:
+        raw = _read_bytes(storage_path)
+    except OSError as e:
+        # Not a corrupted file - leave it alone and let the caller retry later
+        print(f"[ModelPulse] Error reading data file: {e}")
+        raise
+
     try:
-        with FileLock(storage_path):
-            with open(storage_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+        data = loads(raw)
 
         # Handle schema migrations
         data = migrate_schema(data)
@@ -146,27 +254,41 @@ def load_data() -> dict[str, Any]:
         return data
 
 
-def save_data(data: dict[str, Any]) -> None:
+def serialize_data(data: dict[str, Any]) -> bytes:
     """
-    Save usage data to JSON file with file locking.
+    Stamp usage data with the current time and serialize it for saving.
+
+    Callers that share `data` across threads should hold their lock for this
+    call only, and write the result with write_snapshot afterwards.
+    """
+    # Update last_updated timestamp
+    data["metadata"]["last_updated"] = utc_now()[0]
+    return dumps(data, indent=PRETTY_JSON)
+
+
+def write_snapshot(payload: bytes) -> int:
+    """
+    Write serialized usage data to the JSON file with file locking.
 
     Uses exclusive lock to prevent concurrent writes.
+
+    Returns:
+        Size of the written file in bytes
     """
     storage_path = get_storage_path()
 
-    # Update last_updated timestamp
-    data["metadata"]["last_updated"] = datetime.utcnow().isoformat() + "Z"
-
     # Write to temp file first, then rename (atomic operation)
     temp_path = storage_path.with_suffix(".tmp")
 
     try:
-        with FileLock(storage_path):
-            with open(temp_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+        with _write_lock(storage_path):
+            with open(temp_path, "wb") as f:
+                f.write(payload)
 
             # Atomic rename
-            temp_path.replace(storage_path)
+            _replace_file(temp_path, storage_path)
+
+        return len(payload)
 
     except Exception as e:
         # Clean up temp file if it exists
@@ -175,6 +297,84 @@ def save_data(data: dict[str, Any]) -> None:
         raise e
 
 
+def save_data(data: dict[str, Any]) -> int:
+    """
+    Save usage data to JSON file with file locking.
+
+    Returns:
+        Size of the written file in bytes
+    """
+    return write_snapshot(serialize_data(data))
+
+
+def append_journal(entry: dict[str, Any]) -> int:
+    """
+    Append a single usage event to the journal.
+
+    Each event is written as one JSON line, so the cost is proportional to the
+    event size rather than the size of the whole snapshot.
+
+    Returns:
+        Number of bytes appended
+    """
+    line = dumps(entry) + b"\n"
+    with open(get_journal_path(), "ab") as f:
+        f.write(line)
+    return len(line)
+
+
+def read_journal() -> list[dict[str, Any]]:
+    """
+    Read all usage events from the journal, oldest first.
+
+    Includes a rotated journal left behind by an interrupted save. Lines that
+    cannot be parsed (e.g. a partial write after a crash) are skipped.
+    """
+    entries = []
+    for journal_path in (get_rotated_journal_path(), get_journal_path()):
+        if not journal_path.exists():
+            continue
+
+        for line in _read_bytes(journal_path).splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(loads(line))
+            except ValueError:
+                continue
+    return entries
+
+
+def rotate_journal() -> None:
+    """
+    Move the journal aside before its events are written into a snapshot.
+
+    New events go to a fresh journal in the meantime. The rotated journal is
+    removed by discard_rotated_journal once the snapshot is on disk.
+    """
+    journal_path = get_journal_path()
+    if not journal_path.exists():
+        return
+
+    rotated_path = get_rotated_journal_path()
+    if rotated_path.exists():
+        # Left over from a save that didn't finish; keep its events until one does
+        with open(rotated_path, "ab") as f:
+            f.write(_read_bytes(journal_path))
+        journal_path.unlink()
+    else:
+        _replace_file(journal_path, rotated_path)
+
+
+def discard_rotated_journal() -> None:
+    """Remove the rotated journal once its events are part of the snapshot."""
+    try:
+        get_rotated_journal_path().unlink()
+    except FileNotFoundError:
+        pass
+
+
 def migrate_schema(data: dict[str, Any]) -> dict[str, Any]:
     """
     Migrate data to the current schema version.
@@ -196,9 +396,12 @@ def migrate_schema(data: dict[str, Any]) -> dict[str, Any]:
     if current_version < 1:
         data = migrate_to_v1(data)
 
+    if current_version < 2:
+        data = migrate_to_v2(data)
+
     # Future migrations would go here:
-    # if current_version < 2:
-    #     data = migrate_to_v2(data)
+    # if current_version < 3:
+    #     data = migrate_to_v3(data)
 
     data["version"] = SCHEMA_VERSION
     return data
@@ -211,7 +414,7 @@ def migrate_to_v1(data: dict[str, Any]) -> dict[str, Any]:
         data["models"] = {}
 
     if "metadata" not in data:
-        now = datetime.utcnow().isoformat() + "Z"
+        now = utc_now()[0]
         data["metadata"] = {
             "tracking_started": now,
             "last_updated": now,
@@ -223,12 +426,36 @@ def migrate_to_v1(data: dict[str, Any]) -> dict[str, Any]:
             model_data["usage_log"] = []
         if "first_used" not in model_data:
             model_data["first_used"] = model_data.get(
-                "last_used", datetime.utcnow().isoformat() + "Z"
+                "last_used", utc_now()[0]
             )
 
     return data
 
 
+def migrate_to_v2(data: dict[str, Any]) -> dict[str, Any]:
+    """
+    Migrate from v1 to v2 schema.
+
+    usage_log changes from a list of {"date", "count"} entries to a dict of
+    {date: count}, in date order. Rolling totals stored by earlier builds are
+    dropped since they are derived from the log.
+    """
+    for model_data in data.get("models", {}).values():
+        usage_log = model_data.get("usage_log", [])
+        if isinstance(usage_log, list):
+            daily: dict[str, int] = {}
+            for entry in sorted(usage_log, key=lambda entry: entry.get("date", "")):
+                day = entry.get("date")
+                if day:
+                    daily[day] = daily.get(day, 0) + entry.get("count", 0)
+            model_data["usage_log"] = daily
+
+        for key in ("rolling_7", "rolling_30", "rolling_window", "rolling_date"):
+            model_data.pop(key, None)
+
+    return data
+
+
 def backup_corrupted_file(storage_path: Path) -> None:
     """Backup a corrupted file for manual recovery."""
     if storage_path.exists():
@@ -238,21 +465,33 @@ def backup_corrupted_file(storage_path: Path) -> None:
         print(f"[ModelPulse] Backed up corrupted file to {backup_path}")
 
 
-def cleanup_old_usage_logs(data: dict[str, Any], max_days: int = 365) -> dict[str, Any]:
+def cleanup_old_usage_logs(data: dict[str, Any], max_days: int = 365) -> int:
     """
     Clean up old daily usage logs to prevent unbounded growth.
 
-    Keeps the last `max_days` days of daily data.
+    Keeps the last `max_days` days of daily data. Logs are modified in place,
+    and only for models that have entries to trim.
+
+    Returns:
+        Number of log entries removed
     """
     cutoff_date = datetime.utcnow().date()
     from datetime import timedelta
 
     cutoff_str = (cutoff_date - timedelta(days=max_days)).isoformat()
+    removed = 0
 
     for model_data in data.get("models", {}).values():
-        usage_log = model_data.get("usage_log", [])
-        model_data["usage_log"] = [
-            entry for entry in usage_log if entry.get("date", "") >= cutoff_str
-        ]
-
-    return data
+        usage_log = model_data.get("usage_log", {})
+        # Logs are kept in date order, so stop at the first day worth keeping
+        stale = []
+        for day in usage_log:
+            if day >= cutoff_str:
+                break
+            stale.append(day)
+
+        for day in stale:
+            del usage_log[day]
+        removed += len(stale)
+
+    return removed
@@ -4,12 +4,51 @@ ModelPulse - Core Tracking Logic
 Extracts models from prompts and records usage statistics.
 """
 
-from datetime import datetime, timedelta
+import atexit
+import heapq
+import queue
+import threading
+import time
+from collections.abc import Iterator
+from datetime import date, timedelta
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
-from .model_types import MODEL_LOADERS, LOADER_PATTERNS, CATEGORY_FOLDERS
-from .storage import load_data, save_data, cleanup_old_usage_logs
+from .model_types import (
+    MODEL_LOADERS,
+    KNOWN_LOADER_CLASSES,
+    LOADER_PATTERNS_LOWER,
+    CATEGORY_FOLDERS,
+)
+from .storage import (
+    get_storage_path,
+    utc_now,
+    load_data,
+    serialize_data,
+    write_snapshot,
+    cleanup_old_usage_logs,
+    append_journal,
+    read_journal,
+    rotate_journal,
+    discard_rotated_journal,
+)
+
+# The snapshot is rewritten once the journal reaches this fraction of its size,
+# keeping the amortized write cost per event independent of the number of models
+COMPACT_RATIO = 0.25
+
+# Journal size in bytes below which the snapshot is never rewritten
+COMPACT_MIN_BYTES = 16 * 1024
+
+# Seconds the background writer waits to batch save requests
+WRITE_DELAY = 0.5
+
+# Days of usage_log counted by each timeframe (besides today)
+TIMEFRAME_DAYS: dict[str, int] = {
+    "week": 7,
+    "month": 30,
+}
 
 # Try to import ComfyUI's folder_paths for proper model path resolution
 try:
@@ -59,23 +98,210 @@ def get_model_file_size(category: str, name: str) -> int | None:
     return None
 
 
+@lru_cache(maxsize=512)
+def _resolve_loader(class_type: str) -> tuple[str, tuple[str, ...], bool] | None:
+    """
+    Resolve a node class to the model inputs it loads.
+
+    Results are cached per class name, since the mapping never changes at runtime.
+
+    Args:
+        class_type: The node's class_type from the prompt
+
+    Returns:
+        Tuple of (category, input_keys, first_only), or None if the node isn't
+        a model loader. first_only is set for pattern-matched custom loaders,
+        which only record the first input key that holds a value.
+    """
+    # Check standard loaders first
+    if class_type in KNOWN_LOADER_CLASSES:
+        category, input_keys = MODEL_LOADERS[class_type]
+        if isinstance(input_keys, str):
+            input_keys = [input_keys]
+        return category, tuple(input_keys), False
+
+    # Only unknown classes fall through to the substring test; the cache
+    # remembers non-loaders as None so this runs once per class
+    if "Loader" in class_type:
+        class_type_lower = class_type.lower()
+        for pattern, category, possible_keys in LOADER_PATTERNS_LOWER:
+            if pattern in class_type_lower:
+                return category, possible_keys, True  # Only match first pattern
+
+    return None
+
+
+def _iter_prompt_models(prompt: dict[str, Any]) -> Iterator[tuple[str, str]]:
+    """Yield (category, name) for every model referenced by loader nodes in a prompt."""
+    resolve = _resolve_loader
+
+    for node_data in prompt.values():
+        resolved = resolve(node_data.get("class_type", ""))
+        if resolved is None:
+            continue  # Not a loader node
+
+        category, input_keys, first_only = resolved
+        inputs = node_data.get("inputs", {})
+
+        for key in input_keys:
+            value = inputs.get(key)
+            if value and isinstance(value, str):
+                yield category, value
+                if first_only:
+                    break  # Pattern loaders only use the first matching key
+
+
+@lru_cache(maxsize=8)
+def _timeframe_dates(today: str, days: int) -> tuple[str, ...]:
+    """
+    Get the usage_log date keys covered by a timeframe ending today.
+
+    Includes today and the `days` days before it. Cached per day.
+    """
+    today_date = date.fromisoformat(today)
+    return tuple((today_date - timedelta(days=offset)).isoformat() for offset in range(days + 1))
+
+
 class ModelTracker:
     """Tracks model usage across ComfyUI workflow executions."""
 
     def __init__(self):
         self._data: dict[str, Any] | None = None
+        self._dirty_count = 0
+
+        # Sizes used to decide when to fold the journal into the snapshot
+        self._snapshot_bytes = 0
+        self._journal_bytes = 0
+
+        # category -> model_ids, built lazily from _data
+        self._by_category: dict[str, set[str]] | None = None
+
+        # Bumped on every change to the in-memory data
+        self._revision = 0
+
+        # Guards _data against the background writer; never held for file writes
+        self._lock = threading.RLock()
+        # Keeps snapshot writes in order; taken before _lock, never inside it
+        self._save_lock = threading.Lock()
+        self._save_queue: queue.Queue[str] = queue.Queue()
+        self._writer: threading.Thread | None = None
+        atexit.register(self._flush)
 
     @property
     def data(self) -> dict[str, Any]:
         """Lazy-load data from storage."""
         if self._data is None:
-            self._data = load_data()
+            with self._lock:
+                if self._data is None:
+                    self._data = load_data()
+                    try:
+                        self._snapshot_bytes = get_storage_path().stat().st_size
+                    except OSError:
+                        self._snapshot_bytes = 0
+                    if self._replay_journal():
+                        self._request_save()
         return self._data
 
+    @property
+    def revision(self) -> int:
+        """Counter that changes whenever tracked data changes, for cache validation."""
+        return self._revision
+
+    @property
+    def category_index(self) -> dict[str, set[str]]:
+        """Lazily build the category -> model_ids index."""
+        if self._by_category is None:
+            by_category: dict[str, set[str]] = {}
+            for model_id, model_data in self.data["models"].items():
+                by_category.setdefault(model_data["category"], set()).add(model_id)
+            self._by_category = by_category
+        return self._by_category
+
     def _save(self) -> None:
-        """Save current data to storage."""
-        if self._data is not None:
-            save_data(self._data)
+        """
+        Save current data to storage and fold the journal into it.
+
+        Only serialization runs under the data lock, so record_usage never
+        waits on the file write. Must not be called with the data lock held.
+        """
+        with self._save_lock:
+            with self._lock:
+                if self._data is None:
+                    return
+                payload = serialize_data(self._data)
+                # Events from now on go to a fresh journal, newer than this snapshot
+                rotate_journal()
+                pending = self._dirty_count
+                self._journal_bytes = 0
+                self._dirty_count = 0
+
+            try:
+                self._snapshot_bytes = write_snapshot(payload)
+            except Exception:
+                # The rotated journal still holds these events; retry on the next save
+                with self._lock:
+                    self._dirty_count += pending
+                raise
+
+            discard_rotated_journal()
+
+    def _flush(self) -> None:
+        """Save pending changes, if any."""
+        if self._dirty_count:
+            self._save()
+
+    def _request_save(self) -> None:
+        """Ask the background writer to save, starting it on first use."""
+        if self._writer is None:
+            self._writer = threading.Thread(
+                target=self._writer_loop, name="ModelPulseWriter", daemon=True
+            )
+            self._writer.start()
+        self._save_queue.put_nowait("dirty")
+
+    def _writer_loop(self) -> None:
+        """Coalesce save requests and write them off the execution thread."""
+        while True:
+            self._save_queue.get()
+            time.sleep(WRITE_DELAY)
+
+            # Drain requests that arrived while waiting; one save covers them all
+            while True:
+                try:
+                    self._save_queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"[ModelPulse] Error saving usage data: {e}")
+
+    def _replay_journal(self) -> bool:
+        """
+        Apply journaled events that are newer than the loaded snapshot.
+
+        Returns:
+            True if any events were applied and the snapshot needs saving
+        """
+        entries = read_journal()
+        replayed = 0
+
+        snapshot_time = self._data["metadata"]["last_updated"]
+        for entry in entries:
+            now_iso = entry.get("ts", "")
+            if now_iso <= snapshot_time:
+                continue  # Already part of the snapshot
+
+            models = []
+            for model_id in entry.get("models", []):
+                category, _, name = model_id.partition("/")
+                models.append({"category": category, "name": name, "model_id": model_id})
+            self._apply_usage(models, now_iso, now_iso[:10])
+            replayed += 1
+
+        self._dirty_count += replayed
+        return replayed > 0
 
     def extract_models_from_prompt(self, prompt: dict[str, Any]) -> list[dict[str, str]]:
         """
@@ -87,74 +313,18 @@ class ModelTracker:
         Returns:
             List of dicts with 'category', 'name', and 'model_id' keys
         """
-        models = []
-        seen = set()  # Avoid duplicates within same prompt
-
-        for node_id, node_data in prompt.items():
-            class_type = node_data.get("class_type", "")
-            inputs = node_data.get("inputs", {})
-
-            # Check standard loaders first
-            if class_type in MODEL_LOADERS:
-                category, input_keys = MODEL_LOADERS[class_type]
-                extracted = self._extract_from_inputs(category, input_keys, inputs)
-                for model in extracted:
-                    if model["model_id"] not in seen:
-                        seen.add(model["model_id"])
-                        models.append(model)
-
-            # Check pattern-based loaders for custom nodes
-            elif "Loader" in class_type:
-                extracted = self._extract_from_patterns(class_type, inputs)
-                for model in extracted:
-                    if model["model_id"] not in seen:
-                        seen.add(model["model_id"])
-                        models.append(model)
-
-        return models
-
-    def _extract_from_inputs(
-        self, category: str, input_keys: str | list[str], inputs: dict[str, Any]
-    ) -> list[dict[str, str]]:
-        """Extract model names from node inputs."""
-        models = []
+        seen: dict[str, dict[str, str]] = {}  # Avoid duplicates within same prompt
 
-        if isinstance(input_keys, str):
-            input_keys = [input_keys]
-
-        for key in input_keys:
-            value = inputs.get(key)
-            if value and isinstance(value, str):
-                model_id = f"{category}/{value}"
-                models.append({
+        for category, name in _iter_prompt_models(prompt):
+            model_id = f"{category}/{name}"
+            if model_id not in seen:
+                seen[model_id] = {
                     "category": category,
-                    "name": value,
+                    "name": name,
                     "model_id": model_id,
-                })
-
-        return models
-
-    def _extract_from_patterns(
-        self, class_type: str, inputs: dict[str, Any]
-    ) -> list[dict[str, str]]:
-        """Extract models using pattern matching for custom node loaders."""
-        models = []
-
-        for pattern, category, possible_keys in LOADER_PATTERNS:
-            if pattern.lower() in class_type.lower():
-                for key in possible_keys:
-                    value = inputs.get(key)
-                    if value and isinstance(value, str):
-                        model_id = f"{category}/{value}"
-                        models.append({
-                            "category": category,
-                            "name": value,
-                            "model_id": model_id,
-                        })
-                        break  # Found a match for this pattern
-                break  # Only match first pattern
-
-        return models
+                }
+
+        return list(seen.values())
 
     def record_usage(self, models: list[dict[str, str]]) -> None:
         """
@@ -166,26 +336,46 @@ class ModelTracker:
         if not models:
             return
 
-        now = datetime.utcnow()
-        now_iso = now.isoformat() + "Z"
-        today = now.date().isoformat()
+        # Load (and replay) before timestamping so this event is newer than the snapshot
+        self.data
+
+        with self._lock:
+            now_iso, today = utc_now()
+            self._apply_usage(models, now_iso, today)
+
+            # Journal the event; the snapshot is rewritten periodically by the writer thread
+            self._journal_bytes += append_journal(
+                {"ts": now_iso, "models": [model["model_id"] for model in models]}
+            )
+            self._dirty_count += 1
+            self._revision += 1
+
+        if self._journal_bytes >= max(COMPACT_MIN_BYTES, self._snapshot_bytes * COMPACT_RATIO):
+            self._request_save()
+
+    def _apply_usage(
+        self, models: list[dict[str, str]], now_iso: str, today: str
+    ) -> None:
+        """Update in-memory usage records for a single usage event."""
+        models_dict = self.data["models"]
 
         for model in models:
             model_id = model["model_id"]
+            model_data = models_dict.get(model_id)
 
-            if model_id not in self.data["models"]:
+            if model_data is None:
                 # New model - create entry
-                self.data["models"][model_id] = {
+                model_data = models_dict[model_id] = {
                     "category": model["category"],
                     "name": model["name"],
                     "path": model_id,  # We don't have full path, use model_id
                     "first_used": now_iso,
                     "last_used": now_iso,
                     "usage_count": 0,
-                    "usage_log": [],
+                    "usage_log": {},
                 }
-
-            model_data = self.data["models"][model_id]
+                if self._by_category is not None:
+                    self._by_category.setdefault(model["category"], set()).add(model_id)
 
             # Update timestamps and count
             model_data["last_used"] = now_iso
@@ -193,12 +383,7 @@ class ModelTracker:
 
             # Update daily usage log
             usage_log = model_data["usage_log"]
-            if usage_log and usage_log[-1]["date"] == today:
-                usage_log[-1]["count"] += 1
-            else:
-                usage_log.append({"date": today, "count": 1})
-
-        self._save()
+            usage_log[today] = usage_log.get(today, 0) + 1
 
     def extract_and_record_models(self, prompt: dict[str, Any]) -> None:
         """
@@ -207,13 +392,15 @@ class ModelTracker:
         This is the main entry point called from the PromptExecutor hook.
         """
         models = self.extract_models_from_prompt(prompt)
-        self.record_usage(models)
+        if models:
+            self.record_usage(models)
 
     def get_usage_data(
         self,
         timeframe: str = "all",
         sort_by: str = "last_used",
         category: str | None = None,
+        limit: int | None = None,
     ) -> dict[str, Any]:
         """
         Get filtered and sorted usage data.
@@ -222,41 +409,38 @@ class ModelTracker:
             timeframe: "all", "month", or "week"
             sort_by: "last_used", "usage_count", or "name"
             category: Optional category filter
+            limit: Optional maximum number of models to return
 
         Returns:
-            Dict with 'models' list and 'metadata'
+            Dict with 'models' list, 'total' model count and 'metadata'
         """
         models_list = []
-        now = datetime.utcnow()
-
-        # Calculate timeframe boundaries
-        if timeframe == "week":
-            cutoff = now - timedelta(days=7)
-        elif timeframe == "month":
-            cutoff = now - timedelta(days=30)
+        today = utc_now()[1]
+
+        # Daily log keys to count for the timeframe, if not all time
+        timeframe_dates = (
+            _timeframe_dates(today, TIMEFRAME_DAYS[timeframe])
+            if timeframe in TIMEFRAME_DAYS
+            else None
+        )
+
+        models_dict = self.data["models"]
+        if category:
+            # Only visit models in the requested category
+            with self._lock:
+                model_ids = list(self.category_index.get(category, ()))
+            model_items = ((model_id, models_dict[model_id]) for model_id in model_ids)
         else:
-            cutoff = None
-
-        cutoff_date = cutoff.date().isoformat() if cutoff else None
-
-        for model_id, model_data in self.data["models"].items():
-            # Filter by category if specified
-            if category and model_data["category"] != category:
-                continue
+            model_items = models_dict.items()
 
+        for model_id, model_data in model_items:
             # Calculate timeframe-specific usage count
-            if cutoff_date:
-                timeframe_count = sum(
-                    entry["count"]
-                    for entry in model_data.get("usage_log", [])
-                    if entry["date"] >= cutoff_date
-                )
+            if timeframe_dates:
+                usage_log = model_data["usage_log"]
+                timeframe_count = sum(usage_log.get(day, 0) for day in timeframe_dates)
             else:
                 timeframe_count = model_data["usage_count"]
 
-            # Get file size
-            file_size = get_model_file_size(model_data["category"], model_data["name"])
-
             models_list.append({
                 "model_id": model_id,
                 "category": model_data["category"],
@@ -265,24 +449,48 @@ class ModelTracker:
                 "last_used": model_data["last_used"],
                 "usage_count": model_data["usage_count"],
                 "timeframe_count": timeframe_count,
-                "file_size": file_size,
             })
 
         # Sort the results
         if sort_by == "usage_count":
-            models_list.sort(key=lambda x: x["timeframe_count"], reverse=True)
+            sort_key, descending = (lambda x: x["timeframe_count"]), True
         elif sort_by == "name":
-            models_list.sort(key=lambda x: x["name"].lower())
+            sort_key, descending = (lambda x: x["name"].lower()), False
         else:  # last_used (default)
-            models_list.sort(key=lambda x: x["last_used"], reverse=True)
+            sort_key, descending = (lambda x: x["last_used"]), True
+
+        total = len(models_list)
+        if limit is not None and limit < total // 2:
+            # Partial selection is cheaper than a full sort for small limits
+            select = heapq.nlargest if descending else heapq.nsmallest
+            models_list = select(limit, models_list, key=sort_key)
+        else:
+            models_list.sort(key=sort_key, reverse=descending)
+            if limit is not None:
+                models_list = models_list[:limit]
+
+        # Only stat the files of models that are actually returned
+        for model in models_list:
+            model["file_size"] = get_model_file_size(model["category"], model["name"])
 
         return {
             "models": models_list,
+            "total": total,
             "metadata": self.data["metadata"],
             "timeframe": timeframe,
             "sort_by": sort_by,
         }
 
+    def get_category_counts(self) -> dict[str, int]:
+        """
+        Get the number of tracked models in each category.
+
+        Returns:
+            Dict mapping category id to model count
+        """
+        with self._lock:
+            return {category: len(model_ids) for category, model_ids in self.category_index.items()}
+
     def get_model_detail(self, model_id: str) -> dict[str, Any] | None:
         """
         Get detailed usage data for a specific model.
@@ -291,7 +499,8 @@ class ModelTracker:
             model_id: The model identifier (category/filename)
 
         Returns:
-            Model data dict or None if not found
+            Model data dict or None if not found. usage_log is returned as a
+            list of {"date", "count"} entries, independent of the storage schema.
         """
         model_data = self.data["models"].get(model_id)
         if not model_data:
@@ -300,16 +509,32 @@ class ModelTracker:
         return {
             "model_id": model_id,
             **model_data,
+            "usage_log": [
+                {"date": day, "count": count} for day, count in model_data["usage_log"].items()
+            ],
         }
 
     def reset(self) -> None:
         """Reset all tracking data."""
         from .storage import create_empty_data
 
-        self._data = create_empty_data()
+        with self._lock:
+            self._data = create_empty_data()
+            self._by_category = None
+            self._revision += 1
         self._save()
 
-    def cleanup(self, max_days: int = 365) -> None:
-        """Clean up old usage logs."""
-        self._data = cleanup_old_usage_logs(self.data, max_days)
-        self._save()
+    def cleanup(self, max_days: int = 365) -> int:
+        """
+        Clean up old usage logs.
+
+        Returns:
+            Number of log entries removed
+        """
+        with self._lock:
+            removed = cleanup_old_usage_logs(self.data, max_days)
+            if removed:
+                self._revision += 1
+        if removed:
+            self._save()
+        return removed